@@ -13,6 +13,20 @@ Example usage:
 
 __version__ = "1.0.0"
 __author__ = "BrainBox Project"
-__all__ = ["MCDFile", "MCD2HDF5Converter", "print_mcd_info"]
+__all__ = [
+    "MCDFile",
+    "MCD2HDF5Converter",
+    "NPZWriter",
+    "load_npz_mmap",
+    "print_mcd_info",
+]
 
-from .neuroshare_mcd import MCDFile, MCD2HDF5Converter, print_mcd_info
+
+def __getattr__(name):
+    # Import on first use, so that importing the package (e.g. when pytest
+    # loads conftest.py) does not require the Neuroshare library
+    if name in __all__:
+        from . import neuroshare_mcd
+
+        return getattr(neuroshare_mcd, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
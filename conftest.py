@@ -0,0 +1,45 @@
+"""
+Shared pytest fixtures for the neuroshare_mcd tests.
+
+neuroshare_mcd is imported inside the fixtures, and the package __init__
+that pytest runs before loading this file imports it lazily, so loading
+the fixtures does not require the Neuroshare library.
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def mcd_ro():
+    """
+    Read-only MCD file handle shared by all tests of a session.
+
+    The MCDFile readers do not modify the handle (besides filling their
+    caches), so tests can share it. Tests of the file lifecycle open their
+    own file instead.
+    """
+    from neuroshare_mcd import MCDFile
+
+    with MCDFile(os.environ["TEST_MCD_FILE"]) as mcd:
+        yield mcd
+
+
+@pytest.fixture(scope="session")
+def mcd_fixture(mcd_ro):
+    """
+    The shared file handle together with its cached entity listings.
+
+    by_type maps every entity type constant to the entities of that type,
+    so tests look entities up instead of filtering the file again.
+    """
+    from neuroshare_mcd import MCDFile
+
+    entities = mcd_ro.list_entities()
+    by_type = {
+        entity_type: [e for e in entities if e["type"] == entity_type]
+        for entity_type in MCDFile.ENTITY_TYPE_NAMES
+    }
+    return SimpleNamespace(file=mcd_ro, entities=entities, by_type=by_type)
@@ -3,9 +3,67 @@ Example script demonstrating how to use the neuroshare_mcd module
 to read Multi Channel Systems .mcd files.
 """
 
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
+import matplotlib
+
+matplotlib.use("Agg")  # Plots are only saved to files, no display needed
 import matplotlib.pyplot as plt
-from neuroshare_mcd import MCDFile, print_mcd_info
+from neuroshare_mcd import (
+    MCD2HDF5Converter,
+    MCDFile,
+    NPZWriter,
+    load_npz_mmap,
+    print_mcd_info,
+)
+
+
+def _read_ahead(read, items):
+    """
+    Yield (item, read(item)) pairs while the next item is read in the background.
+
+    A single worker thread keeps library calls sequential. Reading the next
+    item overlaps with whatever the caller does with the current one, e.g.
+    file writes, which release the GIL.
+    """
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        previous, future = None, None
+        for item in items:
+            next_future = pool.submit(read, item)
+            if future is not None:
+                yield previous, future.result()
+            previous, future = item, next_future
+        if future is not None:
+            yield previous, future.result()
+
+
+def _minmax_envelope(mcd, entity_id, n_bins=1000):
+    """
+    Compute a min/max envelope of a whole analog channel.
+
+    The channel is read block by block and reduced to at most ``n_bins``
+    (min, max) pairs, so the cost in memory is constant regardless of the
+    recording length.
+
+    Returns:
+        Tuple of (lows, highs, window) where window is the number of samples
+        per bin
+    """
+    n_samples = mcd.get_entity_info(entity_id)["item_count"]
+    window = max(1, -(-n_samples // n_bins))
+    block_size = window * max(1, (1 << 20) // window)  # whole windows per block
+
+    lows, highs = [], []
+    for _, block, _ in mcd.iter_analog_blocks(entity_id, block_size):
+        starts = np.arange(0, len(block), window)
+        lows.append(np.minimum.reduceat(block, starts))
+        highs.append(np.maximum.reduceat(block, starts))
+
+    if not lows:
+        return np.empty(0), np.empty(0), window
+    return np.concatenate(lows), np.concatenate(highs), window
 
 
 def example_basic_usage(mcd_filename):
@@ -53,26 +111,37 @@ def example_read_analog_data(mcd_filename):
         entity_id = analog_entities[0]["id"]
         print(f"\nReading analog entity {entity_id}: {analog_entities[0]['label']}")
 
-        data = mcd.get_analog_data(entity_id)
+        # Only the preview range is needed, so let Neuroshare read just that
+        n_samples = analog_entities[0]["item_count"]
+        plot_samples = min(1000, n_samples)
+        data = mcd.get_analog_data(entity_id, start_index=0, count=plot_samples)
 
         print(f"  Sample rate: {data['sample_rate']} Hz")
         print(f"  Units: {data['units']}")
-        print(f"  Samples: {len(data['data'])}")
-        print(
-            f"  Duration: {data['timestamps'][-1] - data['timestamps'][0]:.2f} seconds"
-        )
-        print(f"  Value range: [{data['data'].min():.6f}, {data['data'].max():.6f}]")
-
-        # Plot a segment of the data
-        plot_samples = min(1000, len(data["data"]))
-        plt.figure(figsize=(12, 4))
-        plt.plot(data["timestamps"][:plot_samples], data["data"][:plot_samples])
-        plt.xlabel("Time (s)")
-        plt.ylabel(f"Signal ({data['units']})")
-        plt.title(f"Analog Signal: {data['label']}")
-        plt.grid(True, alpha=0.3)
+        print(f"  Samples: {n_samples}")
+        print(f"  Duration: {n_samples / data['sample_rate']:.2f} seconds")
+
+        # Envelope of the whole channel, computed block by block
+        lows, highs, window = _minmax_envelope(mcd, entity_id)
+        print(f"  Value range: [{lows.min():.6f}, {highs.max():.6f}]")
+
+        # Plot a segment of the data and the envelope of the whole channel
+        fig, (ax_raw, ax_env) = plt.subplots(2, 1, figsize=(12, 7))
+        ax_raw.plot(data["timestamps"], data["data"])
+        ax_raw.set_xlabel("Time (s)")
+        ax_raw.set_ylabel(f"Signal ({data['units']})")
+        ax_raw.set_title(f"Analog Signal: {data['label']}")
+        ax_raw.grid(True, alpha=0.3)
+
+        bin_times = np.arange(len(lows)) * window / data["sample_rate"]
+        ax_env.fill_between(bin_times, lows, highs, linewidth=0)
+        ax_env.set_xlabel("Time (s)")
+        ax_env.set_ylabel(f"Signal ({data['units']})")
+        ax_env.set_title("Min/max envelope of the full recording")
+        ax_env.grid(True, alpha=0.3)
         plt.tight_layout()
-        plt.savefig("analog_signal_example.png", dpi=150)
+        fig.savefig("analog_signal_example.png", dpi=150)
+        plt.close(fig)
         print("\nPlot saved to: analog_signal_example.png")
 
 
@@ -112,11 +181,13 @@ def example_read_events(mcd_filename):
         # Calculate inter-event intervals
         if len(data["timestamps"]) > 1:
             intervals = np.diff(data["timestamps"])
+            # Min, median and max from a single partition of the array
+            lo, med, hi = np.percentile(intervals, [0, 50, 100])
             print(f"\n  Inter-event intervals:")
             print(f"    Mean: {intervals.mean():.3f} s")
-            print(f"    Median: {np.median(intervals):.3f} s")
-            print(f"    Min: {intervals.min():.3f} s")
-            print(f"    Max: {intervals.max():.3f} s")
+            print(f"    Median: {med:.3f} s")
+            print(f"    Min: {lo:.3f} s")
+            print(f"    Max: {hi:.3f} s")
 
 
 def example_read_segments(mcd_filename):
@@ -160,13 +231,13 @@ def example_read_segments(mcd_filename):
         # Plot first segment
         if entity_info["item_count"] > 0:
             seg = mcd.get_segment_data(entity_id, 0)
-            plt.figure(figsize=(10, 6))
+            fig = plt.figure(figsize=(10, 6))
 
-            # If multiple sources, plot each
+            # Waveforms are sources x samples; plot each source
             if seg["data"].ndim > 1:
-                for source_idx in range(seg["data"].shape[1]):
+                for source_idx in range(seg["data"].shape[0]):
                     plt.plot(
-                        seg["data"][:, source_idx],
+                        seg["data"][source_idx],
                         label=f"Source {source_idx}",
                         alpha=0.7,
                     )
@@ -179,34 +250,49 @@ def example_read_segments(mcd_filename):
             plt.title(f"Spike Waveform (Segment 0, t={seg['timestamp']:.3f}s)")
             plt.grid(True, alpha=0.3)
             plt.tight_layout()
-            plt.savefig("spike_waveform_example.png", dpi=150)
+            fig.savefig("spike_waveform_example.png", dpi=150)
+            plt.close(fig)
             print("\nPlot saved to: spike_waveform_example.png")
 
 
-def example_filter_and_export(mcd_filename, output_filename):
+def example_filter_and_export(mcd_filename, output_filename, prefetch=False):
     """
     Example: Filter specific entity types and export to numpy format.
+
+    Channels are streamed into an uncompressed .npz archive so that at most
+    two channels (the one being written and the next one) are held in memory.
+    With prefetch, the OS is asked to read the whole file ahead first, which
+    only pays off for files that fit into free memory (see MCDFile.prefetch).
     """
     print("\n" + "=" * 70)
     print("EXAMPLE 5: Filter and Export")
     print("=" * 70)
 
-    with MCDFile(mcd_filename) as mcd:
-        export_data = {}
+    with MCDFile(mcd_filename) as mcd, NPZWriter(output_filename) as npz:
+        keys = []
+
+        # Every channel is read, so the OS may read the file ahead
+        if prefetch:
+            mcd.prefetch()
 
-        # Export all analog channels
+        # Export all analog channels; the next channel is read while the
+        # current one is written, so at most two are in memory at a time
         analog_entities = mcd.get_entities_by_type("analog")
         print(f"\nExporting {len(analog_entities)} analog channels...")
 
-        for entity in analog_entities:
-            data = mcd.get_analog_data(entity["id"])
-            channel_name = entity["label"].replace(" ", "_").replace("/", "_")
-            export_data[f"analog_{channel_name}"] = {
-                "data": data["data"],
-                "timestamps": data["timestamps"],
-                "sample_rate": data["sample_rate"],
-                "units": data["units"],
-            }
+        channels = _read_ahead(lambda e: mcd.get_analog_data(e["id"]), analog_entities)
+        for entity, data in channels:
+            channel_name = mcd.get_safe_label(entity["id"])
+            key = f"analog_{channel_name}"
+            npz.write(f"{key}_data", np.asarray(data["data"], dtype=np.float64))
+            npz.write(
+                f"{key}_timestamps", np.asarray(data["timestamps"], dtype=np.float64)
+            )
+            npz.write(
+                f"{key}_sample_rate", np.asarray(data["sample_rate"], dtype=np.float64)
+            )
+            npz.write(f"{key}_units", np.asarray(data["units"], dtype=np.str_))
+            keys.append(key)
 
         # Export all events
         event_entities = mcd.get_entities_by_type("event")
@@ -214,16 +300,70 @@ def example_filter_and_export(mcd_filename, output_filename):
 
         for entity in event_entities:
             data = mcd.get_event_data(entity["id"])
-            event_name = entity["label"].replace(" ", "_").replace("/", "_")
-            export_data[f"event_{event_name}"] = {
-                "timestamps": data["timestamps"],
-                "values": data["values"],
-            }
+            event_name = mcd.get_safe_label(entity["id"])
+            key = f"event_{event_name}"
+            npz.write(
+                f"{key}_timestamps", np.asarray(data["timestamps"], dtype=np.float64)
+            )
+            values = data["values"]
+            if isinstance(values, np.ndarray) and values.dtype != object:
+                npz.write(f"{key}_values", values)
+            keys.append(key)
+
+    print(f"\nData exported to: {output_filename}")
+    print(f"Channels in file: {keys}")
+
+    # Channels can be loaded individually without reading the whole file
+    exported = load_npz_mmap(output_filename)
+    print(f"Arrays in file: {len(exported)}")
+
+
+def example_stream_to_hdf5(mcd_filename, output_filename):
+    """
+    Example: Stream analog channels to HDF5 block by block.
+
+    Each channel is written in ~1 MB chunks, so memory use stays at one
+    block regardless of the recording length. Samples are stored as int16
+    ADC codes; physical values are ``data * scale + offset``.
+    """
+    import h5py
+
+    print("\n" + "=" * 70)
+    print("EXAMPLE 6: Streaming Export to HDF5")
+    print("=" * 70)
+
+    block_size = (1 << 20) // np.dtype(np.int16).itemsize  # ~1 MB per chunk
+
+    with (
+        MCDFile(mcd_filename) as mcd,
+        h5py.File(output_filename, "w", **MCD2HDF5Converter.HDF5_CACHE) as h5,
+    ):
+        analog_entities = mcd.get_entities_by_type("analog")
+        print(f"\nStreaming {len(analog_entities)} analog channels...")
+
+        for entity in analog_entities:
+            info = mcd.get_entity_info(entity["id"])
+            n_samples = entity["item_count"]
+            channel_name = mcd.get_safe_label(entity["id"])
+
+            # HDF5 cannot chunk an empty dataset
+            dset = h5.create_dataset(
+                f"analog_{channel_name}",
+                shape=(n_samples,),
+                dtype=np.int16,
+                chunks=(min(block_size, n_samples),) if n_samples else None,
+            )
+            scale, offset = mcd.get_analog_scale(entity["id"])
+            dset.attrs["scale"] = scale
+            dset.attrs["offset"] = offset
+            dset.attrs["sample_rate"] = info["sample_rate"]
+            dset.attrs["units"] = info["units"]
+
+            blocks = mcd.iter_analog_blocks(entity["id"], block_size, raw=True)
+            for start, block, _ in blocks:
+                dset[start : start + len(block)] = block
 
-        # Save to numpy format
-        np.savez(output_filename, **export_data)
-        print(f"\nData exported to: {output_filename}")
-        print(f"Keys in file: {list(export_data.keys())}")
+    print(f"\nData exported to: {output_filename}")
 
 
 def example_comprehensive_analysis(mcd_filename):
@@ -231,18 +371,15 @@ def example_comprehensive_analysis(mcd_filename):
     Comprehensive example combining multiple data types.
     """
     print("\n" + "=" * 70)
-    print("EXAMPLE 6: Comprehensive Analysis")
+    print("EXAMPLE 7: Comprehensive Analysis")
     print("=" * 70)
 
     with MCDFile(mcd_filename) as mcd:
         # Get summary statistics for each entity type
-        entities_by_type = {}
+        entities_by_type = defaultdict(list)
 
         for entity in mcd.list_entities():
-            etype = entity["type_name"]
-            if etype not in entities_by_type:
-                entities_by_type[etype] = []
-            entities_by_type[etype].append(entity)
+            entities_by_type[entity["type_name"]].append(entity)
 
         print(f"\nEntity Summary:")
         for etype, entities in sorted(entities_by_type.items()):
@@ -274,6 +411,7 @@ if __name__ == "__main__":
         example_read_events(mcd_file)
         example_read_segments(mcd_file)
         example_filter_and_export(mcd_file, "exported_data.npz")
+        example_stream_to_hdf5(mcd_file, "exported_data.h5")
         example_comprehensive_analysis(mcd_file)
 
         print("\n" + "=" * 70)
@@ -43,7 +43,7 @@ plot(data)
 # PYTHON VERSION (equivalent code)
 # ==============================================================================
 
-from neuroshare_mcd import MCDFile
+from neuroshare_mcd import MCDFile, NPZWriter
 import matplotlib.pyplot as plt
 
 # Open file (library path auto-detected)
@@ -88,20 +88,21 @@ def pythonic_example_1():
         # Get all analog channels
         for entity in mcd.get_entities_by_type("analog"):
             print(f"Reading: {entity['label']}")
-            data = mcd.get_analog_data(entity["id"])
 
-            # Plot first second of data
-            sample_rate = data["sample_rate"]
-            n_samples = int(sample_rate)  # 1 second
+            # Read only the first second of data
+            sample_rate = mcd.get_entity_info(entity["id"])["sample_rate"]
+            n_samples = min(int(sample_rate), entity["item_count"])  # 1 second
+            data = mcd.get_analog_data(entity["id"], count=n_samples)
 
-            plt.figure(figsize=(12, 3))
-            plt.plot(data["timestamps"][:n_samples], data["data"][:n_samples])
+            fig = plt.figure(figsize=(12, 3))
+            plt.plot(data["timestamps"], data["data"])
             plt.xlabel("Time (s)")
             plt.ylabel(f"Signal ({data['units']})")
             plt.title(entity["label"])
             plt.grid(True, alpha=0.3)
             plt.tight_layout()
-            plt.savefig(f"{entity['label'].replace(' ', '_')}.png")
+            fig.savefig(f"{entity['label'].replace(' ', '_')}.png", dpi=72)
+            plt.close(fig)  # One figure per channel would otherwise accumulate
 
 
 def pythonic_example_2():
@@ -111,27 +112,35 @@ def pythonic_example_2():
     with MCDFile("NeuroshareExample.mcd") as mcd:
         # Get all segment entities (spikes)
         for entity in mcd.get_entities_by_type("segment"):
-            # Read all segments
+            # Read all segments as contiguous arrays
             segments = mcd.get_all_segments(entity["id"])
-
-            # Organize by unit ID
-            units = {}
-            for seg in segments:
-                unit_id = seg["unit_id"]
-                if unit_id not in units:
-                    units[unit_id] = {"timestamps": [], "waveforms": []}
-                units[unit_id]["timestamps"].append(seg["timestamp"])
-                units[unit_id]["waveforms"].append(seg["data"])
+            unit_ids = segments["unit_ids"]
+            if len(unit_ids) == 0:
+                continue
+
+            # Group by unit ID with one sort instead of per-spike list appends
+            order = np.argsort(unit_ids, kind="stable")
+            units, starts = np.unique(unit_ids[order], return_index=True)
+            counts = np.diff(np.r_[starts, len(unit_ids)])
+            # The sorted copy is the only full-size temporary; it is squared
+            # in place once the sums have been taken
+            waveforms = segments["waveforms"][order]
+
+            # Per-unit mean and standard deviation from summed (squared) waveforms
+            n = counts[:, None, None]
+            means = np.add.reduceat(waveforms, starts, axis=0) / n
+            np.square(waveforms, out=waveforms)
+            squares = np.add.reduceat(waveforms, starts, axis=0) / n
+            stds = np.sqrt(np.maximum(squares - means**2, 0))
 
             # Plot average waveform for each unit
             fig, axes = plt.subplots(len(units), 1, figsize=(8, 2 * len(units)))
             if len(units) == 1:
                 axes = [axes]
 
-            for idx, (unit_id, unit_data) in enumerate(sorted(units.items())):
-                waveforms = np.array(unit_data["waveforms"])
-                mean_waveform = waveforms.mean(axis=0)
-                std_waveform = waveforms.std(axis=0)
+            for idx, unit_id in enumerate(units):
+                mean_waveform = means[idx, 0]  # first source
+                std_waveform = stds[idx, 0]
 
                 axes[idx].plot(mean_waveform, "b-", linewidth=2)
                 axes[idx].fill_between(
@@ -140,13 +149,12 @@ def pythonic_example_2():
                     mean_waveform + std_waveform,
                     alpha=0.3,
                 )
-                axes[idx].set_title(
-                    f"Unit {unit_id} (n={len(unit_data['timestamps'])} spikes)"
-                )
+                axes[idx].set_title(f"Unit {unit_id} (n={counts[idx]} spikes)")
                 axes[idx].grid(True, alpha=0.3)
 
             plt.tight_layout()
-            plt.savefig(f"{entity['label']}_units.png")
+            fig.savefig(f"{entity['label']}_units.png")
+            plt.close(fig)
 
 
 def pythonic_example_3():
@@ -154,34 +162,53 @@ def pythonic_example_3():
     import numpy as np
     import json
 
+    try:
+        import orjson  # Faster JSON encoder, optional
+    except ImportError:
+        orjson = None
+
     with MCDFile("NeuroshareExample.mcd") as mcd:
-        # Export to numpy .npz
-        export_dict = {}
+        # Export to numpy .npz, streaming one channel at a time
+        with NPZWriter("exported_data.npz") as npz:
+            # Add analog data
+            for entity in mcd.get_entities_by_type("analog"):
+                data = mcd.get_analog_data(entity["id"])
+                key = f"analog_{mcd.get_safe_label(entity['id'])}"
+                npz.write(key, np.asarray(data["data"], dtype=np.float64))
+                npz.write(
+                    f"{key}_time", np.asarray(data["timestamps"], dtype=np.float64)
+                )
+                npz.write(
+                    f"{key}_sr", np.asarray(data["sample_rate"], dtype=np.float64)
+                )
+
+            # Add events
+            for entity in mcd.get_entities_by_type("event"):
+                data = mcd.get_event_data(entity["id"])
+                key = f"event_{mcd.get_safe_label(entity['id'])}"
+                npz.write(
+                    f"{key}_time", np.asarray(data["timestamps"], dtype=np.float64)
+                )
+                values = data["values"]
+                if isinstance(values, np.ndarray) and values.dtype != object:
+                    npz.write(f"{key}_values", values)
 
-        # Add analog data
-        for entity in mcd.get_entities_by_type("analog"):
-            data = mcd.get_analog_data(entity["id"])
-            key = f"analog_{entity['label'].replace(' ', '_')}"
-            export_dict[key] = data["data"]
-            export_dict[f"{key}_time"] = data["timestamps"]
-            export_dict[f"{key}_sr"] = data["sample_rate"]
-
-        # Add events
-        for entity in mcd.get_entities_by_type("event"):
-            data = mcd.get_event_data(entity["id"])
-            key = f"event_{entity['label'].replace(' ', '_')}"
-            export_dict[f"{key}_time"] = data["timestamps"]
-            if isinstance(data["values"], np.ndarray):
-                export_dict[f"{key}_values"] = data["values"]
-
-        # Save
-        np.savez("exported_data.npz", **export_dict)
         print("Saved to: exported_data.npz")
 
         # Also save metadata as JSON
         metadata = {"file_info": mcd.info(), "entities": mcd.list_entities()}
-        with open("metadata.json", "w") as f:
-            json.dump(metadata, f, indent=2, default=str)
+        if orjson is not None:
+            with open("metadata.json", "wb") as f:
+                f.write(
+                    orjson.dumps(
+                        metadata,
+                        default=str,
+                        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_INDENT_2,
+                    )
+                )
+        else:
+            with open("metadata.json", "w") as f:
+                json.dump(metadata, f, indent=2, default=str)
         print("Metadata saved to: metadata.json")
 
 
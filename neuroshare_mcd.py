@@ -19,8 +19,9 @@ Requirements:
 
 import os
 import sys
+import zipfile
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 import numpy as np
 
 try:
@@ -60,6 +61,14 @@ class MCDFile:
         3: "segment",
         4: "neural",
     }
+    # Reverse lookup of ENTITY_TYPE_NAMES, e.g. "analog" -> ENTITY_ANALOG
+    ENTITY_TYPE_IDS = {name: num for num, name in ENTITY_TYPE_NAMES.items()}
+
+    # Library found by the default search, shared by all instances
+    _cached_library_path: Optional[str] = None
+
+    # Handles of the directories added to the Windows DLL search path
+    _dll_directories: Dict[str, object] = {}
 
     def __init__(self, filename: str, library_path: Optional[str] = None):
         """
@@ -85,6 +94,12 @@ class MCDFile:
         # Load the library and open file
         self._lib = None
         self._file = None
+        self._entities = None
+        self._entities_by_type = None
+        self._type_slices = None
+        self._safe_labels = None
+        self._info_cache = {}
+        self._entity_cache = {}
         self._open_file()
 
     def _find_library_path(self, library_path: Optional[str]) -> str:
@@ -103,6 +118,10 @@ class MCDFile:
         if library_path and os.path.exists(library_path):
             return library_path
 
+        cached = MCDFile._cached_library_path
+        if cached and os.path.exists(cached):
+            return cached
+
         # Default search locations
         script_dir = Path(__file__).parent.parent
         search_paths = [
@@ -118,13 +137,17 @@ class MCDFile:
         else:  # Linux
             lib_names = ["nsMCDLibrary.so"]
 
+        # One directory listing per search path instead of a stat per name
         for search_path in search_paths:
-            if not search_path.exists():
+            try:
+                with os.scandir(search_path) as entries:
+                    present = {entry.name for entry in entries}
+            except OSError:
                 continue
             for lib_name in lib_names:
-                lib_file = search_path / lib_name
-                if lib_file.exists():
-                    return str(lib_file)
+                if lib_name in present:
+                    MCDFile._cached_library_path = str(search_path / lib_name)
+                    return MCDFile._cached_library_path
 
         # If not found, return a default path and let neuroshare try to find it
         return str(search_paths[0] / lib_names[0]) if search_paths else None
@@ -143,11 +166,9 @@ class MCDFile:
                 lib_dir = os.path.dirname(self.library_path)
                 lib_name = os.path.basename(self.library_path)
 
-                # Some systems need the directory in PATH
+                # Windows needs the directory on the DLL search path
                 if sys.platform == "win32" and lib_dir:
-                    os.environ["PATH"] = (
-                        lib_dir + os.pathsep + os.environ.get("PATH", "")
-                    )
+                    self._add_dll_directory(lib_dir)
 
                 # Try to load with specific library
                 try:
@@ -163,6 +184,23 @@ class MCDFile:
         except Exception as e:
             raise RuntimeError(f"Failed to open MCD file: {e}")
 
+    @classmethod
+    def _add_dll_directory(cls, lib_dir: str):
+        """
+        Add a directory to the Windows DLL search path, once per process.
+
+        The directory is registered with os.add_dll_directory, which covers
+        loads with the default search flags, and prepended to PATH for
+        libraries that use the legacy LoadLibrary search order.
+
+        Args:
+            lib_dir: Directory containing the Neuroshare library
+        """
+        if lib_dir in cls._dll_directories:
+            return
+        cls._dll_directories[lib_dir] = os.add_dll_directory(lib_dir)
+        os.environ["PATH"] = lib_dir + os.pathsep + os.environ.get("PATH", "")
+
     def __enter__(self):
         """Context manager entry."""
         return self
@@ -178,6 +216,36 @@ class MCDFile:
             # but we can delete the reference
             self._file = None
         self._lib = None
+        self._entities = None
+        self._entities_by_type = None
+        self._type_slices = None
+        self._safe_labels = None
+        self._info_cache = {}
+        self._entity_cache = {}
+
+    def prefetch(self):
+        """
+        Hint the operating system to read the file into the page cache.
+
+        Useful before bulk exports that read every entity. The hint covers
+        the whole file, so only use it for files that fit into free memory;
+        for larger files the early pages are evicted again before they are
+        read. The Neuroshare library does not expose its file descriptor, so
+        the hint is given on a separate descriptor; the page cache it fills
+        is shared with the library's own reads. Does nothing where
+        posix_fadvise is unavailable.
+        """
+        if not hasattr(os, "posix_fadvise"):
+            return
+
+        try:
+            fd = os.open(self.filename, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass  # Only a hint; reading works without it
 
     def info(self) -> Dict:
         """
@@ -216,37 +284,161 @@ class MCDFile:
 
         return info
 
-    def list_entities(self) -> List[Dict]:
+    def _entity(self, entity_id: int):
         """
-        List all entities in the file.
+        Get the cached Neuroshare entity handle.
+
+        Each call of File.get_entity queries the library again, so handles
+        are kept for as long as the file is open.
+
+        Args:
+            entity_id: ID of the entity
 
         Returns:
-            List of dictionaries, each containing:
-                - id: Entity ID
-                - label: Entity label/name
-                - type: Entity type (1=event, 2=analog, 3=segment, 4=neural)
-                - type_name: Human-readable type name
-                - item_count: Number of data items
+            neuroshare entity object
+        """
+        if self._file is None:
+            raise RuntimeError("File is not open")
+
+        entity = self._entity_cache.get(entity_id)
+        if entity is None:
+            entity = self._file.get_entity(entity_id)
+            self._entity_cache[entity_id] = entity
+        return entity
+
+    def _entity_table(self) -> np.ndarray:
+        """
+        Get the cached entity metadata table.
+
+        The table is read once per open file, so that listing and filtering
+        entities does not query the Neuroshare library for every entity again.
+
+        Returns:
+            Structured array with one row per entity and the fields
+            id, type, item_count and label
         """
         if self._file is None:
             raise RuntimeError("File is not open")
 
-        entities = []
+        if self._entities is None:
+            entities = [self._entity(i) for i in range(self._file.entity_count)]
+            label_width = max((len(e.label) for e in entities), default=1)
+            dtype = np.dtype(
+                [
+                    ("id", np.int32),
+                    ("type", np.int8),
+                    ("item_count", np.int64),
+                    ("label", f"U{max(label_width, 1)}"),
+                ]
+            )
+            self._entities = np.array(
+                [
+                    (i, e.entity_type, e.item_count, e.label)
+                    for i, e in enumerate(entities)
+                ],
+                dtype=dtype,
+            )
+            self._safe_labels = np.char.replace(
+                np.char.replace(self._entities["label"], " ", "_"), "/", "_"
+            )
+
+            # Stable sort keeps entities of one type in id order, so that
+            # each type maps to a contiguous slice of the sorted table
+            order = np.argsort(self._entities["type"], kind="stable")
+            self._entities_by_type = self._entities[order]
+            types, starts = np.unique(self._entities_by_type["type"], return_index=True)
+            stops = np.append(starts[1:], len(order))
+            self._type_slices = {
+                int(t): slice(int(a), int(b)) for t, a, b in zip(types, starts, stops)
+            }
+
+        return self._entities
+
+    def _entity_dict(self, row) -> Dict:
+        """Convert a row of the entity table to an entity dictionary."""
+        return {
+            "id": int(row["id"]),
+            "label": str(row["label"]),
+            "type": int(row["type"]),
+            "type_name": self.ENTITY_TYPE_NAMES.get(int(row["type"]), "unknown"),
+            "item_count": int(row["item_count"]),
+        }
+
+    def iter_entities(
+        self, entity_type: Optional[Union[str, int]] = None
+    ) -> Iterator[Dict]:
+        """
+        Iterate over the entities in the file.
+
+        Entities are served from the entity table if it has already been
+        built, otherwise they are looked up one at a time, so breaking out
+        of the loop early skips the remaining entities. Entities of other
+        types are skipped before their dictionaries are built.
+
+        Args:
+            entity_type: Optional type filter - either numeric (1-4) or
+                        string ('event', 'analog', 'segment', 'neural')
+
+        Yields:
+            Entity dictionaries as returned by list_entities
+        """
+        if self._file is None:
+            raise RuntimeError("File is not open")
+
+        type_num = None if entity_type is None else self._type_number(entity_type)
+
+        if self._entities is not None:
+            if type_num is None:
+                rows = self._entities
+            else:
+                type_slice = self._type_slices.get(type_num, slice(0, 0))
+                rows = self._entities_by_type[type_slice]
+            for row in rows:
+                yield self._entity_dict(row)
+            return
+
         for i in range(self._file.entity_count):
-            entity = self._file.get_entity(i)
-            entities.append(
+            entity = self._entity(i)
+            if type_num is not None and entity.entity_type != type_num:
+                continue
+            yield self._entity_dict(
                 {
                     "id": i,
                     "label": entity.label,
                     "type": entity.entity_type,
-                    "type_name": self.ENTITY_TYPE_NAMES.get(
-                        entity.entity_type, "unknown"
-                    ),
                     "item_count": entity.item_count,
                 }
             )
 
-        return entities
+    def iter_entities_with_handle(
+        self, entity_type: Optional[Union[str, int]] = None
+    ) -> Iterator[Tuple[Dict, object]]:
+        """
+        Iterate over entities together with their Neuroshare entity handles.
+
+        Args:
+            entity_type: Optional type filter (see iter_entities)
+
+        Yields:
+            Tuples of (entity dictionary, neuroshare entity object)
+        """
+        for entity_info in self.iter_entities(entity_type):
+            yield entity_info, self._entity(entity_info["id"])
+
+    def list_entities(self) -> List[Dict]:
+        """
+        List all entities in the file.
+
+        Returns:
+            List of dictionaries, each containing:
+                - id: Entity ID
+                - label: Entity label/name
+                - type: Entity type (1=event, 2=analog, 3=segment, 4=neural)
+                - type_name: Human-readable type name
+                - item_count: Number of data items
+        """
+        self._entity_table()
+        return list(self.iter_entities())
 
     def get_entities_by_type(self, entity_type: Union[str, int]) -> List[Dict]:
         """
@@ -259,22 +451,40 @@ class MCDFile:
         Returns:
             List of entity dictionaries matching the type
         """
+        type_num = self._type_number(entity_type)
+        self._entity_table()
+        return list(self.iter_entities(type_num))
+
+    @classmethod
+    def _type_number(cls, entity_type: Union[str, int]) -> int:
+        """Resolve an entity type name or number to the type number."""
         if isinstance(entity_type, str):
-            entity_type = entity_type.lower()
-            type_map = {v: k for k, v in self.ENTITY_TYPE_NAMES.items()}
-            if entity_type not in type_map:
+            type_num = cls.ENTITY_TYPE_IDS.get(entity_type.lower())
+            if type_num is None:
                 raise ValueError(f"Invalid entity type: {entity_type}")
-            type_num = type_map[entity_type]
-        else:
-            type_num = entity_type
+            return type_num
+        return entity_type
 
-        all_entities = self.list_entities()
-        return [e for e in all_entities if e["type"] == type_num]
+    def get_safe_label(self, entity_id: int) -> str:
+        """
+        Get an entity label that can be used as a file, key or dataset name.
+
+        Args:
+            entity_id: Entity ID
+
+        Returns:
+            Entity label with spaces and slashes replaced by underscores
+        """
+        self._entity_table()
+        return str(self._safe_labels[entity_id])
 
     def get_entity_info(self, entity_id: int) -> Dict:
         """
         Get detailed information about a specific entity.
 
+        Results are cached per open file, so repeated calls for the same
+        entity do not query the Neuroshare library again.
+
         Args:
             entity_id: Entity ID
 
@@ -284,7 +494,10 @@ class MCDFile:
         if self._file is None:
             raise RuntimeError("File is not open")
 
-        entity = self._file.get_entity(entity_id)
+        if entity_id in self._info_cache:
+            return dict(self._info_cache[entity_id])
+
+        entity = self._entity(entity_id)
 
         info = {
             "id": entity_id,
@@ -315,43 +528,121 @@ class MCDFile:
                 }
             )
 
-        return info
+        self._info_cache[entity_id] = info
+        return dict(info)
 
     def get_analog_data(
-        self, entity_id: int, start_index: int = 0, count: int = -1
+        self,
+        entity_id: int,
+        start_index: int = 0,
+        count: int = -1,
+        raw: bool = False,
+        block_size: int = 1 << 20,
+        out: Optional[np.ndarray] = None,
     ) -> Dict:
         """
         Read analog signal data (continuous electrode recordings).
 
+        Reads longer than block_size samples are done block by block into
+        preallocated arrays, so the Neuroshare library never has to return
+        the whole recording in a single buffer.
+
         Args:
             entity_id: ID of the analog entity
             start_index: Starting index (default: 0)
             count: Number of samples to read (default: -1 = all)
+            raw: If True, return int16 sample codes instead of physical
+                 values (see get_analog_scale)
+            block_size: Maximum number of samples per library call
+                        (default: 2**20)
+            out: Optional 1-D array with room for the requested samples.
+                 The data is written into it and returned as data, or a
+                 leading slice of it. The samples must cast to its dtype
+                 with same_kind casting, e.g. float32 for values, but no
+                 integer dtype. The library still returns every block in
+                 an array of its own, which is copied into out, so this
+                 saves no allocation for reads of a single block; it only
+                 replaces the full-length result array of block-by-block
+                 reads
 
         Returns:
             Dictionary containing:
-                - data: numpy array of signal values
+                - data: numpy array of signal values (int16 codes if raw)
                 - timestamps: numpy array of timestamps (seconds)
                 - continuous_count: Number of continuous samples
                 - sample_rate: Sampling rate in Hz
                 - units: Physical units
                 - metadata: Additional metadata
+                - scale, offset: Code to value mapping (only if raw)
 
         Raises:
-            ValueError: If entity is not an analog entity
+            ValueError: If entity is not an analog entity, or out is too
+                        small or of a dtype the samples cannot be cast to
         """
         if self._file is None:
             raise RuntimeError("File is not open")
 
-        entity = self._file.get_entity(entity_id)
+        entity = self._entity(entity_id)
 
         if entity.entity_type != self.ENTITY_ANALOG:
             raise ValueError(f"Entity {entity_id} is not an analog entity")
 
-        # Get data
-        data, timestamps, cont_count = entity.get_data(start_index, count)
+        return self._read_analog(entity, start_index, count, raw, block_size, out)
 
-        return {
+    def _read_analog(
+        self,
+        entity,
+        start_index: int = 0,
+        count: int = -1,
+        raw: bool = False,
+        block_size: int = 1 << 20,
+        out: Optional[np.ndarray] = None,
+    ) -> Dict:
+        """Read analog data from an entity handle (see get_analog_data)."""
+        total = max(entity.item_count - start_index, 0)
+        if count >= 0:
+            total = min(count, total)
+
+        if out is not None:
+            if out.ndim != 1 or len(out) < total:
+                raise ValueError(
+                    f"out must be a 1-D array with room for {total} samples, "
+                    f"got shape {out.shape}"
+                )
+            dtype = np.dtype(np.int16 if raw else np.float64)
+            if not np.can_cast(dtype, out.dtype, "same_kind"):
+                raise ValueError(
+                    f"out of dtype {out.dtype} cannot hold {dtype} samples"
+                )
+            if len(out) > total:
+                out = out[:total]
+
+        blocks = self._read_analog_blocks(entity, block_size, start_index, total, raw)
+
+        if 0 < total <= block_size and out is None:
+            # A single block is returned as read, without copying
+            _, data, timestamps, cont_count = next(blocks)
+        else:
+            if out is not None:
+                data = out
+            else:
+                data = np.empty(total, dtype=np.int16 if raw else np.float64)
+            timestamps = np.empty(total, dtype=np.float64)
+            cont_count = 0
+            contiguous = True
+
+            for block_start, block, block_times, block_count in blocks:
+                n = len(block)
+                data[block_start : block_start + n] = block
+                timestamps[block_start : block_start + n] = block_times
+
+                # Continuous samples counted from start_index, as returned
+                # by a single read of the whole range
+                if contiguous:
+                    cont_count += block_count
+                    contiguous = block_count == n
+
+        result = {
             "data": data,
             "timestamps": timestamps,
             "continuous_count": cont_count,
@@ -368,6 +659,134 @@ class MCDFile:
             },
         }
 
+        if raw:
+            result["scale"], result["offset"] = self._analog_scale(entity)
+
+        return result
+
+    def get_analog_scale(self, entity_id: int) -> Tuple[float, float]:
+        """
+        Get the mapping between int16 sample codes and physical values.
+
+        Values are reconstructed as ``code * scale + offset``. The scale is
+        the ADC resolution, so data recorded with a 16-bit ADC round-trips
+        exactly (up to float rounding); otherwise the value range is spread
+        over the int16 range and the error stays below half a step.
+
+        Args:
+            entity_id: ID of the analog entity
+
+        Returns:
+            Tuple of (scale, offset) in physical units
+
+        Raises:
+            ValueError: If entity is not an analog entity
+        """
+        if self._file is None:
+            raise RuntimeError("File is not open")
+
+        entity = self._entity(entity_id)
+
+        if entity.entity_type != self.ENTITY_ANALOG:
+            raise ValueError(f"Entity {entity_id} is not an analog entity")
+
+        return self._analog_scale(entity)
+
+    @staticmethod
+    def _analog_scale(entity) -> Tuple[float, float]:
+        """Compute (scale, offset) mapping int16 codes to values of an entity."""
+        value_range = entity.max_value - entity.min_value
+        resolution = entity.resolution
+
+        # 65536 codes span 65535 steps of the resolution
+        if resolution > 0 and value_range <= resolution * 65535 * (1 + 1e-9):
+            scale = resolution
+        elif value_range > 0:
+            scale = value_range / 65535
+        else:
+            scale = 1.0
+
+        # Place min_value at the lowest int16 code
+        offset = entity.min_value + 32768 * scale
+        return scale, offset
+
+    @staticmethod
+    def _to_int16(data: np.ndarray, scale: float, offset: float) -> np.ndarray:
+        """Quantize physical values to int16 codes."""
+        codes = np.rint((data - offset) / scale)
+        np.clip(codes, -32768, 32767, out=codes)
+        return codes.astype(np.int16)
+
+    def iter_analog_blocks(
+        self,
+        entity_id: int,
+        block_size: int = 1 << 20,
+        start_index: int = 0,
+        count: int = -1,
+        raw: bool = False,
+    ) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+        """
+        Read analog signal data in fixed-size blocks.
+
+        Only one block is held in memory at a time, which allows streaming
+        channels that are larger than the available RAM.
+
+        Args:
+            entity_id: ID of the analog entity
+            block_size: Maximum number of samples per block (default: 2**20)
+            start_index: Starting index (default: 0)
+            count: Number of samples to read (default: -1 = all)
+            raw: If True, yield int16 sample codes instead of physical
+                 values (see get_analog_scale)
+
+        Yields:
+            Tuples of (offset, data, timestamps), where offset is the position
+            of the block relative to start_index
+
+        Raises:
+            ValueError: If entity is not an analog entity
+        """
+        if self._file is None:
+            raise RuntimeError("File is not open")
+
+        entity = self._entity(entity_id)
+
+        if entity.entity_type != self.ENTITY_ANALOG:
+            raise ValueError(f"Entity {entity_id} is not an analog entity")
+
+        for offset, data, timestamps, _ in self._read_analog_blocks(
+            entity, block_size, start_index, count, raw
+        ):
+            yield offset, data, timestamps
+
+    def _read_analog_blocks(
+        self,
+        entity,
+        block_size: int = 1 << 20,
+        start_index: int = 0,
+        count: int = -1,
+        raw: bool = False,
+    ) -> Iterator[Tuple[int, np.ndarray, np.ndarray, int]]:
+        """
+        Read analog blocks from an entity handle (see iter_analog_blocks).
+
+        Yields (offset, data, timestamps, continuous_count) tuples, where
+        continuous_count is the count the library reports for the block.
+        """
+        total = entity.item_count - start_index
+        if count >= 0:
+            total = min(count, total)
+
+        if raw:
+            scale, value_offset = self._analog_scale(entity)
+
+        for offset in range(0, max(total, 0), block_size):
+            n = min(block_size, total - offset)
+            data, timestamps, cont_count = entity.get_data(start_index + offset, n)
+            if raw:
+                data = self._to_int16(data, scale, value_offset)
+            yield offset, data, timestamps, cont_count
+
     def get_event_data(self, entity_id: int) -> Dict:
         """
         Read event data (e.g., triggers, digital markers).
@@ -378,7 +797,8 @@ class MCDFile:
         Returns:
             Dictionary containing:
                 - timestamps: numpy array of event timestamps (seconds)
-                - values: numpy array or list of event values
+                - values: numpy array of event values (object array for
+                  text events)
                 - event_type: Type of event data
                 - label: Entity label
 
@@ -388,26 +808,38 @@ class MCDFile:
         if self._file is None:
             raise RuntimeError("File is not open")
 
-        entity = self._file.get_entity(entity_id)
+        entity = self._entity(entity_id)
 
         if entity.entity_type != self.ENTITY_EVENT:
             raise ValueError(f"Entity {entity_id} is not an event entity")
 
-        # Read all events
-        n_events = entity.item_count
-        timestamps = np.zeros(n_events)
-        values = []
-
-        for i in range(n_events):
-            timestamp, value = entity.get_data(i)
-            timestamps[i] = timestamp
-            values.append(value)
+        return self._read_event(entity)
 
-        # Convert values to numpy array if possible
-        try:
-            values = np.array(values)
-        except:
-            pass  # Keep as list if values are heterogeneous
+    def _read_event(self, entity) -> Dict:
+        """Read all events from an entity handle (see get_event_data)."""
+        # Read all events into preallocated arrays. The first event
+        # determines the value dtype and shape. Values NumPy can only hold as
+        # objects (text, library structs) go into an object array. A later
+        # number that the dtype cannot hold promotes the array, as np.array
+        # would, and a value of another kind or shape turns it into objects
+        n_events = entity.item_count
+        timestamps = np.empty(n_events, dtype=np.float64)
+        values = np.empty(0)
+
+        if n_events > 0:
+            timestamps[0], first_value = entity.get_data(0)
+            probe = np.asarray(first_value)
+            if probe.dtype.kind in "biuf":
+                values = np.empty((n_events,) + probe.shape, dtype=probe.dtype)
+            else:
+                values = np.empty(n_events, dtype=object)
+            values[0] = first_value
+
+            for i in range(1, n_events):
+                timestamps[i], value = entity.get_data(i)
+                if values.dtype != object:
+                    values = self._fit_event_value(values, value, i)
+                values[i] = value
 
         return {
             "timestamps": timestamps,
@@ -416,6 +848,24 @@ class MCDFile:
             "label": entity.label,
         }
 
+    @classmethod
+    def _fit_event_value(cls, values: np.ndarray, value, n_filled: int) -> np.ndarray:
+        """Return values, promoted or copied to objects so that value fits."""
+        probe = np.asarray(value)
+        if probe.dtype.kind not in "biuf" or probe.shape != values.shape[1:]:
+            return cls._to_object_array(values, n_filled)
+        if np.can_cast(probe.dtype, values.dtype):
+            return values
+        return values.astype(np.result_type(values.dtype, probe.dtype))
+
+    @staticmethod
+    def _to_object_array(values: np.ndarray, n_filled: int) -> np.ndarray:
+        """Copy the first n_filled values into a 1-D object array."""
+        objects = np.empty(len(values), dtype=object)
+        for i in range(n_filled):
+            objects[i] = values[i]
+        return objects
+
     def get_segment_data(self, entity_id: int, index: int) -> Dict:
         """
         Read segment data (spike waveforms).
@@ -426,7 +876,7 @@ class MCDFile:
 
         Returns:
             Dictionary containing:
-                - data: numpy array of waveform data (samples x sources)
+                - data: numpy array of waveform data (sources x samples)
                 - timestamp: Timestamp of the segment (seconds)
                 - sample_count: Number of samples
                 - unit_id: Unit classification ID
@@ -440,7 +890,7 @@ class MCDFile:
         if self._file is None:
             raise RuntimeError("File is not open")
 
-        entity = self._file.get_entity(entity_id)
+        entity = self._entity(entity_id)
 
         if entity.entity_type != self.ENTITY_SEGMENT:
             raise ValueError(f"Entity {entity_id} is not a segment entity")
@@ -458,29 +908,81 @@ class MCDFile:
             "label": entity.label,
         }
 
-    def get_all_segments(self, entity_id: int) -> List[Dict]:
+    def get_all_segments(
+        self, entity_id: int, start_index: int = 0, count: int = -1
+    ) -> Dict:
         """
         Read all segments from a segment entity.
 
+        Segments are returned as contiguous arrays rather than one dictionary
+        per segment, so that waveforms can be processed with vectorized NumPy
+        operations.
+
         Args:
             entity_id: ID of the segment entity
+            start_index: Index of the first segment (default: 0)
+            count: Number of segments to read (default: -1 = all)
 
         Returns:
-            List of segment data dictionaries
+            Dictionary containing:
+                - waveforms: numpy array (segments x sources x samples);
+                  samples beyond a segment's sample_count are zero
+                - timestamps: numpy array of segment timestamps (seconds)
+                - sample_counts: numpy array of samples per segment
+                - unit_ids: numpy array of unit classification IDs
+                - source_count: Number of sources
+                - sample_rate: Sampling rate in Hz
+                - label: Entity label
+
+        Raises:
+            ValueError: If entity is not a segment entity
         """
         if self._file is None:
             raise RuntimeError("File is not open")
 
-        entity = self._file.get_entity(entity_id)
+        entity = self._entity(entity_id)
 
         if entity.entity_type != self.ENTITY_SEGMENT:
             raise ValueError(f"Entity {entity_id} is not a segment entity")
 
-        segments = []
-        for i in range(entity.item_count):
-            segments.append(self.get_segment_data(entity_id, i))
+        return self._read_segments(entity, start_index, count)
+
+    def _read_segments(self, entity, start_index: int = 0, count: int = -1) -> Dict:
+        """Read segments from an entity handle (see get_all_segments)."""
+        n_segments = max(entity.item_count - start_index, 0)
+        if count >= 0:
+            n_segments = min(count, n_segments)
+        max_samples = entity.max_sample_count
+        waveforms = np.empty(
+            (n_segments, entity.source_count, max_samples), dtype=np.float64
+        )
+        timestamps = np.empty(n_segments, dtype=np.float64)
+        sample_counts = np.empty(n_segments, dtype=np.int32)
+        unit_ids = np.empty(n_segments, dtype=np.int32)
+
+        # Keep the per-segment loop down to the library call and buffer stores
+        read_segment = entity.get_data
+        for i in range(n_segments):
+            (
+                waveforms[i],
+                timestamps[i],
+                sample_counts[i],
+                unit_ids[i],
+            ) = read_segment(start_index + i)
+
+        # Zero the padding of short segments in one pass
+        padding = np.arange(max_samples) >= sample_counts[:, None]
+        waveforms.transpose(0, 2, 1)[padding] = 0
 
-        return segments
+        return {
+            "waveforms": waveforms,
+            "timestamps": timestamps,
+            "sample_counts": sample_counts,
+            "unit_ids": unit_ids,
+            "source_count": entity.source_count,
+            "sample_rate": entity.sample_rate,
+            "label": entity.label,
+        }
 
     def get_neural_data(
         self, entity_id: int, start_index: int = 0, count: int = -1
@@ -504,19 +1006,29 @@ class MCDFile:
         if self._file is None:
             raise RuntimeError("File is not open")
 
-        entity = self._file.get_entity(entity_id)
+        entity = self._entity(entity_id)
 
         if entity.entity_type != self.ENTITY_NEURAL:
             raise ValueError(f"Entity {entity_id} is not a neural entity")
 
-        # Get data
-        if count < 0:
-            count = entity.item_count
+        return self._read_neural(entity, start_index, count)
 
-        data = entity.get_data(start_index, count)
+    def _read_neural(self, entity, start_index: int = 0, count: int = -1) -> Dict:
+        """Read spike times from an entity handle (see get_neural_data)."""
+        n_events = max(entity.item_count - start_index, 0)
+        if count >= 0:
+            n_events = min(count, n_events)
+
+        # python-neuroshare returns a float64 array; other bindings may hand
+        # back a sequence, which is copied once into a buffer of known size
+        data = entity.get_data(start_index, n_events)
+        if isinstance(data, np.ndarray):
+            timestamps = np.asarray(data, dtype=np.float64)
+        else:
+            timestamps = np.fromiter(data, dtype=np.float64, count=n_events)
 
         return {
-            "timestamps": data,
+            "timestamps": timestamps,
             "label": entity.label,
         }
 
@@ -529,23 +1041,65 @@ class MCD2HDF5Converter:
     and datasets for the data.
     """
 
-    def __init__(self, mcd_filename: str, hdf5_filename: str):
+    # HDF5 chunk cache settings: 128 MB cache, a prime number of hash slots
+    # well above the number of cached chunks, and eviction that prefers
+    # fully written chunks
+    HDF5_CACHE = {
+        "rdcc_nbytes": 128 * 1024 * 1024,
+        "rdcc_nslots": 10007,
+        "rdcc_w0": 0.75,
+    }
+
+    # Default number of analog samples read and written per block, which is
+    # also the chunk size of the analog datasets
+    BLOCK_SIZE = 1 << 20
+
+    # Number of segments read and written per block
+    SEGMENT_BLOCK_SIZE = 1024
+
+    def __init__(
+        self,
+        mcd_filename: str,
+        hdf5_filename: str,
+        compression: Optional[str] = "lzf",
+        chunk_size: int = BLOCK_SIZE,
+        as_int16: bool = True,
+        prefetch: bool = False,
+    ):
         """
         Initialize converter.
 
         Args:
             mcd_filename: Path to input MCD file
             hdf5_filename: Path to output HDF5 file
+            compression: HDF5 compression filter ('lzf', 'gzip' or None).
+                         The byte shuffle filter is applied together with
+                         compression (default: 'lzf')
+            chunk_size: Analog samples per chunk and per read (default: 2**20)
+            as_int16: Store analog data as int16 codes with scale and offset
+                      attributes instead of float64 values (default: True).
+                      Values are ``code * scale + offset``, see
+                      MCDFile.get_analog_scale for the quantization error
+            prefetch: Ask the OS to read the whole MCD file into the page
+                      cache before converting (default: False). Only
+                      worthwhile for files that fit into free memory, see
+                      MCDFile.prefetch
         """
         self.mcd_filename = mcd_filename
         self.hdf5_filename = hdf5_filename
+        self.compression = compression
+        self.chunk_size = chunk_size
+        self.as_int16 = as_int16
+        self.prefetch = prefetch
 
     def convert(self, progress_callback=None):
         """
         Convert MCD file to HDF5.
 
         Args:
-            progress_callback: Optional callback function(current, total, message)
+            progress_callback: Optional callback function(current, total, message).
+                               It is called at most once per percent of
+                               entities, plus once when conversion completes
         """
         try:
             import h5py
@@ -555,7 +1109,9 @@ class MCD2HDF5Converter:
             )
 
         with MCDFile(self.mcd_filename) as mcd:
-            with h5py.File(self.hdf5_filename, "w") as h5:
+            if self.prefetch:
+                mcd.prefetch()
+            with h5py.File(self.hdf5_filename, "w", **self.HDF5_CACHE) as h5:
                 # Write file info as attributes
                 info = mcd.info()
                 for key, value in info.items():
@@ -563,62 +1119,309 @@ class MCD2HDF5Converter:
                         h5.attrs[key] = value
 
                 # Create groups for each entity type
-                event_grp = h5.create_group("events")
-                analog_grp = h5.create_group("analog")
-                segment_grp = h5.create_group("segments")
-                neural_grp = h5.create_group("neural")
-
-                entities = mcd.list_entities()
-                total = len(entities)
-
-                for i, entity_info in enumerate(entities):
-                    if progress_callback:
-                        progress_callback(
-                            i, total, f"Converting {entity_info['label']}"
-                        )
-
-                    entity_id = entity_info["id"]
-                    entity_type = entity_info["type"]
-                    label = entity_info["label"].replace(
-                        "/", "_"
-                    )  # HDF5 doesn't like /
-
-                    try:
-                        if entity_type == MCDFile.ENTITY_EVENT:
-                            data = mcd.get_event_data(entity_id)
-                            grp = event_grp.create_group(label)
-                            grp.create_dataset("timestamps", data=data["timestamps"])
-                            if isinstance(data["values"], np.ndarray):
-                                grp.create_dataset("values", data=data["values"])
-
-                        elif entity_type == MCDFile.ENTITY_ANALOG:
-                            data = mcd.get_analog_data(entity_id)
-                            grp = analog_grp.create_group(label)
-                            grp.create_dataset("data", data=data["data"])
-                            grp.create_dataset("timestamps", data=data["timestamps"])
-                            grp.attrs["sample_rate"] = data["sample_rate"]
-                            grp.attrs["units"] = data["units"]
-
-                        elif entity_type == MCDFile.ENTITY_SEGMENT:
-                            segments = mcd.get_all_segments(entity_id)
-                            grp = segment_grp.create_group(label)
-                            for seg_idx, seg in enumerate(segments):
-                                seg_grp = grp.create_group(f"segment_{seg_idx:04d}")
-                                seg_grp.create_dataset("data", data=seg["data"])
-                                seg_grp.attrs["timestamp"] = seg["timestamp"]
-                                seg_grp.attrs["unit_id"] = seg["unit_id"]
-
-                        elif entity_type == MCDFile.ENTITY_NEURAL:
-                            data = mcd.get_neural_data(entity_id)
-                            grp = neural_grp.create_group(label)
-                            grp.create_dataset("timestamps", data=data["timestamps"])
-
-                    except Exception as e:
-                        print(f"Warning: Failed to convert entity {label}: {e}")
+                groups = {
+                    MCDFile.ENTITY_EVENT: h5.create_group("events"),
+                    MCDFile.ENTITY_ANALOG: h5.create_group("analog"),
+                    MCDFile.ENTITY_SEGMENT: h5.create_group("segments"),
+                    MCDFile.ENTITY_NEURAL: h5.create_group("neural"),
+                }
+
+                total = info["entity_count"]
+                last_percent = -1
+
+                def report(current, message):
+                    nonlocal last_percent
+                    percent = 100 * current // total
+                    if progress_callback and percent != last_percent:
+                        last_percent = percent
+                        progress_callback(current, total, message)
+
+                entities = mcd.iter_entities_with_handle()
+                for i, (entity_info, entity) in enumerate(entities):
+                    report(i, f"Converting {entity_info['label']}")
+                    self._convert_one(mcd, entity_info, entity, groups)
 
                 if progress_callback:
                     progress_callback(total, total, "Conversion complete")
 
+    def _convert_one(self, mcd: MCDFile, entity_info: Dict, entity, groups: Dict):
+        """
+        Convert one entity into the group of its type.
+
+        Failures are reported as warnings, so that one broken entity does not
+        abort the conversion of the others.
+
+        Args:
+            mcd: Open MCD file
+            entity_info: Entity dictionary as returned by iter_entities
+            entity: Neuroshare entity handle
+            groups: HDF5 groups by entity type
+        """
+        entity_type = entity_info["type"]
+        label = entity_info["label"].replace("/", "_")  # HDF5 doesn't like /
+
+        try:
+            if entity_type == MCDFile.ENTITY_EVENT:
+                data = mcd._read_event(entity)
+                grp = groups[entity_type].create_group(label)
+                self._create_dataset(grp, "timestamps", data["timestamps"])
+                if data["values"].dtype != object:
+                    self._create_dataset(grp, "values", data["values"])
+
+            elif entity_type == MCDFile.ENTITY_ANALOG:
+                self._write_analog(mcd, entity, groups[entity_type], label)
+
+            elif entity_type == MCDFile.ENTITY_SEGMENT:
+                self._write_segments(mcd, entity, groups[entity_type], label)
+
+            elif entity_type == MCDFile.ENTITY_NEURAL:
+                data = mcd._read_neural(entity)
+                grp = groups[entity_type].create_group(label)
+                self._create_dataset(grp, "timestamps", data["timestamps"])
+
+        except Exception as e:
+            print(f"Warning: Failed to convert entity {label}: {e}")
+
+    def _create_dataset(
+        self, grp, name: str, data=None, shape=None, dtype=None, chunks=None
+    ):
+        """
+        Create a dataset with the converter's compression settings.
+
+        Chunk shapes are clipped to the dataset shape. Empty datasets are
+        created without chunking or filters, which HDF5 requires.
+
+        Args:
+            grp: HDF5 group to create the dataset in
+            name: Dataset name
+            data: Array to store, or None to create an empty dataset
+            shape: Dataset shape (if data is None)
+            dtype: Dataset dtype (if data is None)
+            chunks: Chunk shape, or None to let h5py choose one
+
+        Returns:
+            The new h5py dataset
+        """
+        if data is not None:
+            shape, dtype = data.shape, data.dtype
+
+        if 0 in shape:
+            return grp.create_dataset(name, shape=shape, dtype=dtype)
+
+        if chunks is not None:
+            chunks = tuple(max(1, min(c, n)) for c, n in zip(chunks, shape))
+
+        return grp.create_dataset(
+            name,
+            shape=shape,
+            dtype=dtype,
+            data=data,
+            chunks=chunks,
+            compression=self.compression,
+            shuffle=self.compression is not None,
+        )
+
+    @staticmethod
+    def _write_block(dset, data: np.ndarray, start: int):
+        """
+        Write a block of rows into a dataset, starting at row start.
+
+        write_direct hands the buffer straight to HDF5 instead of going
+        through h5py's generic slice assignment.
+        """
+        data = np.ascontiguousarray(data, dtype=dset.dtype)
+        dset.write_direct(data, dest_sel=np.s_[start : start + len(data)])
+
+    def _write_analog(self, mcd: MCDFile, entity, parent, label: str):
+        """
+        Stream one analog entity into chunked datasets of a new group.
+
+        Args:
+            mcd: Open MCD file
+            entity: Neuroshare analog entity handle
+            parent: HDF5 group to create the entity group in
+            label: Name of the entity group
+        """
+        shape = (entity.item_count,)
+        chunks = (self.chunk_size,)
+        dtype = np.int16 if self.as_int16 else np.float64
+
+        grp = parent.create_group(label)
+        dset = self._create_dataset(
+            grp, "data", shape=shape, dtype=dtype, chunks=chunks
+        )
+        tset = self._create_dataset(
+            grp, "timestamps", shape=shape, dtype=np.float64, chunks=chunks
+        )
+        grp.attrs["sample_rate"] = entity.sample_rate
+        grp.attrs["units"] = entity.units
+
+        if self.as_int16:
+            scale, offset = mcd._analog_scale(entity)
+            dset.attrs["scale"] = scale
+            dset.attrs["offset"] = offset
+            dset.attrs["units"] = entity.units
+
+        for block_start, data, timestamps, _ in mcd._read_analog_blocks(
+            entity, self.chunk_size, raw=self.as_int16
+        ):
+            self._write_block(dset, data, block_start)
+            self._write_block(tset, timestamps, block_start)
+
+    def _write_segments(self, mcd: MCDFile, entity, parent, label: str):
+        """
+        Store one segment entity as stacked datasets of a new group.
+
+        All segments of the entity share one waveforms dataset
+        (segments x sources x samples, zero padded as in get_all_segments)
+        plus timestamps, sample_counts and unit_ids datasets, instead of one
+        HDF5 group per segment.
+
+        Args:
+            mcd: Open MCD file
+            entity: Neuroshare segment entity handle
+            parent: HDF5 group to create the entity group in
+            label: Name of the entity group
+        """
+        n_segments = entity.item_count
+        shape = (n_segments, entity.source_count, entity.max_sample_count)
+        block = self.SEGMENT_BLOCK_SIZE
+
+        columns = {
+            "timestamps": np.float64,
+            "sample_counts": np.int32,
+            "unit_ids": np.int32,
+        }
+
+        grp = parent.create_group(label)
+        wset = self._create_dataset(
+            grp,
+            "waveforms",
+            shape=shape,
+            dtype=np.float64,
+            chunks=(block,) + shape[1:],
+        )
+        dsets = {
+            name: self._create_dataset(
+                grp, name, shape=(n_segments,), dtype=dtype, chunks=(block,)
+            )
+            for name, dtype in columns.items()
+        }
+        grp.attrs["source_count"] = entity.source_count
+        grp.attrs["sample_rate"] = entity.sample_rate
+
+        for offset in range(0, n_segments, block):
+            segments = mcd._read_segments(entity, offset, block)
+            self._write_block(wset, segments["waveforms"], offset)
+            for name, dset in dsets.items():
+                self._write_block(dset, segments[name], offset)
+
+
+class NPZWriter:
+    """
+    Write arrays one at a time into an uncompressed .npz archive.
+
+    Unlike ``np.savez``, arrays do not need to be collected in a dict first,
+    so a channel can be written and released before the next one is read.
+    Members are stored without compression, which allows them to be
+    memory-mapped again with :func:`load_npz_mmap`.
+
+    Example:
+        >>> with NPZWriter('export.npz') as npz:
+        ...     npz.write('analog_ch1_data', data)
+    """
+
+    def __init__(self, filename: str):
+        """
+        Create the archive.
+
+        Args:
+            filename: Path to the output .npz file
+        """
+        self.filename = str(filename)
+        self._zip = zipfile.ZipFile(
+            self.filename, "w", compression=zipfile.ZIP_STORED, allowZip64=True
+        )
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
+
+    def write(self, name: str, array) -> None:
+        """
+        Add an array to the archive.
+
+        Args:
+            name: Key under which the array is stored (without .npy suffix)
+            array: Array-like data; object arrays are rejected
+
+        Raises:
+            ValueError: If the array would require pickling
+        """
+        array = np.asanyarray(array)
+        with self._zip.open(f"{name}.npy", "w", force_zip64=True) as f:
+            np.lib.format.write_array(f, array, allow_pickle=False)
+
+    def close(self) -> None:
+        """Finish writing the archive."""
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+
+def load_npz_mmap(filename: str) -> Dict[str, np.ndarray]:
+    """
+    Memory-map all arrays of an uncompressed .npz archive.
+
+    No array data is read until it is accessed, so individual channels can
+    be loaded from a large export without reading the whole file.
+
+    Args:
+        filename: Path to a .npz file written by :class:`NPZWriter` or
+                  ``np.savez`` (not ``np.savez_compressed``)
+
+    Returns:
+        Dictionary mapping array names to read-only ``np.memmap`` views
+
+    Raises:
+        ValueError: If a member is compressed and cannot be memory-mapped
+    """
+    arrays = {}
+    with zipfile.ZipFile(filename) as zf, open(filename, "rb") as f:
+        for member in zf.infolist():
+            if not member.filename.endswith(".npy"):
+                continue
+            if member.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"Member {member.filename} is compressed")
+
+            # Skip the local file header (30 bytes + name + extra field)
+            f.seek(member.header_offset + 26)
+            name_len = int.from_bytes(f.read(2), "little")
+            extra_len = int.from_bytes(f.read(2), "little")
+            f.seek(member.header_offset + 30 + name_len + extra_len)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f)
+            else:
+                header = np.lib.format.read_array_header_2_0(f)
+            shape, fortran_order, dtype = header
+
+            arrays[member.filename[: -len(".npy")]] = np.memmap(
+                filename,
+                dtype=dtype,
+                mode="r",
+                offset=f.tell(),
+                shape=shape,
+                order="F" if fortran_order else "C",
+            )
+
+    return arrays
+
 
 def print_mcd_info(filename: str):
     """
@@ -640,7 +1443,7 @@ def print_mcd_info(filename: str):
         print(f"{'ID':<5} {'Type':<10} {'Label':<40} {'Items':<10}")
         print("-" * 70)
 
-        for entity in mcd.list_entities():
+        for entity in mcd.iter_entities():
             print(
                 f"{entity['id']:<5} {entity['type_name']:<10} "
                 f"{entity['label']:<40} {entity['item_count']:<10}"
@@ -2,30 +2,84 @@
 Tests for neuroshare_mcd module.
 
 Run with: pytest test_neuroshare_mcd.py
+In parallel (pytest-xdist): pytest -n auto --dist=loadgroup test_neuroshare_mcd.py
+Including full-length reads (nightly): pytest -m "slow or not slow" test_neuroshare_mcd.py
+Utility tests only: RUN_UTIL_TESTS_ONLY=1 pytest test_neuroshare_mcd.py
 """
 
 import pytest
 import numpy as np
 from pathlib import Path
-import tempfile
 import os
+from types import SimpleNamespace
 
 
+# Test data path - you'll need to provide a real MCD file for actual testing
+TEST_MCD_FILE = os.environ.get("TEST_MCD_FILE", None)
+
+# Without a test file only the utility tests can run; skip the module (and
+# the Neuroshare import) unless they were asked for explicitly
+if TEST_MCD_FILE is None and not os.environ.get("RUN_UTIL_TESTS_ONLY"):
+    pytest.skip(
+        "No test MCD file specified (set TEST_MCD_FILE or RUN_UTIL_TESTS_ONLY)",
+        allow_module_level=True,
+    )
+
 # Try to import the module
 try:
-    from neuroshare_mcd import MCDFile, MCD2HDF5Converter
+    from neuroshare_mcd import MCDFile, MCD2HDF5Converter, NPZWriter, load_npz_mmap
 
     NEUROSHARE_AVAILABLE = True
 except ImportError:
     NEUROSHARE_AVAILABLE = False
     pytest.skip("neuroshare not available", allow_module_level=True)
 
+try:
+    import h5py
 
-# Test data path - you'll need to provide a real MCD file for actual testing
-TEST_MCD_FILE = os.environ.get("TEST_MCD_FILE", None)
+    H5PY_AVAILABLE = True
+except ImportError:
+    H5PY_AVAILABLE = False
+
+# Samples read by the analog contract tests; full reads are marked slow
+ANALOG_PREFIX = 1024
+
+
+def _assert_analoglike(data, key="data"):
+    """Assert that data[key] is a numeric array with one row per timestamp."""
+    values = data[key]
+    timestamps = data["timestamps"]
+    assert values.shape[:1] == timestamps.shape
+    assert values.dtype.kind in "fiu"
+    assert timestamps.dtype.kind == "f"
+
+
+def _first_with_data(mcd_fixture, entity_type, min_items=1):
+    """Return the first entity of a type with min_items items, or skip."""
+    for entity in mcd_fixture.by_type[entity_type]:
+        if entity["item_count"] >= min_items:
+            return entity
+    name = MCDFile.ENTITY_TYPE_NAMES[entity_type]
+    pytest.skip(f"No {name} entity with at least {min_items} items")
 
 
+class _FakeEventEntity:
+    """Event entity handle that returns the given values."""
+
+    def __init__(self, values):
+        self.item_count = len(values)
+        self.event_type = 0
+        self.label = "fake"
+        self._values = values
+
+    def get_data(self, index):
+        return float(index), self._values[index]
+
+
+# One xdist group keeps the class on a single worker, so the session-scoped
+# file handle is opened by one worker while other classes run on other workers
 @pytest.mark.skipif(TEST_MCD_FILE is None, reason="No test MCD file specified")
+@pytest.mark.xdist_group("mcd_ro")
 class TestMCDFile:
     """Tests for MCDFile class."""
 
@@ -40,189 +94,387 @@ class TestMCDFile:
         with MCDFile(TEST_MCD_FILE) as mcd:
             assert mcd._file is not None
 
-    def test_get_info(self):
+    def test_get_info(self, mcd_ro):
         """Test getting file info."""
-        with MCDFile(TEST_MCD_FILE) as mcd:
-            info = mcd.info()
-            assert "entity_count" in info
-            assert "time_span" in info
-            assert "file_type" in info
-            assert info["entity_count"] > 0
+        info = mcd_ro.info()
+        assert "entity_count" in info
+        assert "time_span" in info
+        assert "file_type" in info
+        assert info["entity_count"] > 0
 
-    def test_list_entities(self):
+    def test_list_entities(self, mcd_ro):
         """Test listing entities."""
+        entities = mcd_ro.list_entities()
+        assert len(entities) > 0
+
+        # Check entity structure
+        entity = entities[0]
+        assert "id" in entity
+        assert "label" in entity
+        assert "type" in entity
+        assert "type_name" in entity
+        assert "item_count" in entity
+
+    def test_iter_entities(self, mcd_fixture):
+        """Test lazy entity iteration matches list_entities."""
+        # Own file, so that iteration runs before the entity table is built
         with MCDFile(TEST_MCD_FILE) as mcd:
-            entities = mcd.list_entities()
-            assert len(entities) > 0
-
-            # Check entity structure
-            entity = entities[0]
-            assert "id" in entity
-            assert "label" in entity
-            assert "type" in entity
-            assert "type_name" in entity
-            assert "item_count" in entity
-
-    def test_get_entities_by_type(self):
-        """Test filtering entities by type."""
-        with MCDFile(TEST_MCD_FILE) as mcd:
-            # Test string filter
-            analog_entities = mcd.get_entities_by_type("analog")
-            for entity in analog_entities:
-                assert entity["type"] == MCDFile.ENTITY_ANALOG
+            lazy = list(mcd.iter_entities())
+        assert lazy == mcd_fixture.entities
+        assert lazy == list(mcd_fixture.file.iter_entities())
 
-            # Test numeric filter
-            event_entities = mcd.get_entities_by_type(MCDFile.ENTITY_EVENT)
-            for entity in event_entities:
-                assert entity["type"] == MCDFile.ENTITY_EVENT
-
-    def test_get_entity_info(self):
+    def test_get_entities_by_type(self, mcd_ro, mcd_fixture):
+        """Test filtering entities by type."""
+        # Test string filter
+        analog_type = MCDFile.ENTITY_TYPE_IDS["analog"]
+        analog_entities = mcd_ro.get_entities_by_type("analog")
+        for entity in analog_entities:
+            assert entity["type"] == analog_type
+        assert analog_entities == mcd_fixture.by_type[analog_type]
+
+        # Test numeric filter
+        event_entities = mcd_ro.get_entities_by_type(MCDFile.ENTITY_EVENT)
+        for entity in event_entities:
+            assert entity["type"] == MCDFile.ENTITY_EVENT
+
+    @pytest.mark.parametrize(
+        "values, kind",
+        [
+            pytest.param([1, 2, 3], "i", id="int"),
+            pytest.param([1, 1.5, 2.7], "f", id="int-then-float"),
+            pytest.param([np.int16(1), 70000], "i", id="int16-then-wider"),
+            pytest.param([1, "text"], "O", id="int-then-text"),
+            pytest.param([[1, 2], [3]], "O", id="shape-change"),
+        ],
+    )
+    def test_read_event_value_dtype(self, mcd_ro, values, kind):
+        """Test that event values keep their value when the dtype changes."""
+        data = mcd_ro._read_event(_FakeEventEntity(values))
+        assert data["values"].dtype.kind == kind
+        assert len(data["values"]) == len(values)
+        for value, expected in zip(data["values"], values):
+            np.testing.assert_array_equal(value, expected)
+
+    def test_get_entity_info(self, mcd_ro, mcd_fixture):
         """Test getting entity info."""
-        with MCDFile(TEST_MCD_FILE) as mcd:
-            entities = mcd.list_entities()
-            if len(entities) > 0:
-                entity_id = entities[0]["id"]
-                info = mcd.get_entity_info(entity_id)
-                assert info["id"] == entity_id
-                assert "label" in info
-                assert "metadata_raw" in info
-
-    def test_get_analog_data(self):
-        """Test reading analog data."""
-        with MCDFile(TEST_MCD_FILE) as mcd:
-            analog_entities = mcd.get_entities_by_type("analog")
-
-            if len(analog_entities) > 0:
-                entity_id = analog_entities[0]["id"]
-                data = mcd.get_analog_data(entity_id)
-
-                assert "data" in data
-                assert "timestamps" in data
-                assert "sample_rate" in data
-                assert "units" in data
-                assert isinstance(data["data"], np.ndarray)
-                assert isinstance(data["timestamps"], np.ndarray)
-                assert len(data["data"]) == len(data["timestamps"])
-
-    def test_get_analog_data_partial(self):
+        entities = mcd_fixture.entities
+        if len(entities) > 0:
+            entity_id = entities[0]["id"]
+            info = mcd_ro.get_entity_info(entity_id)
+            assert info["id"] == entity_id
+            assert "label" in info
+            assert "metadata_raw" in info
+
+    @pytest.mark.parametrize(
+        "entity_type, reader, args, keys, values_key",
+        [
+            pytest.param(
+                MCDFile.ENTITY_ANALOG,
+                "get_analog_data",
+                (0, ANALOG_PREFIX),
+                ("data", "timestamps", "sample_rate", "units"),
+                "data",
+                id="analog",
+            ),
+            pytest.param(
+                MCDFile.ENTITY_EVENT,
+                "get_event_data",
+                (),
+                ("timestamps", "values"),
+                "values",
+                id="event",
+            ),
+            pytest.param(
+                MCDFile.ENTITY_SEGMENT,
+                "get_segment_data",
+                (0,),
+                ("data", "timestamp", "sample_count", "unit_id"),
+                None,
+                id="segment",
+            ),
+            pytest.param(
+                MCDFile.ENTITY_NEURAL,
+                "get_neural_data",
+                (),
+                ("timestamps",),
+                "timestamps",
+                id="neural",
+            ),
+        ],
+    )
+    def test_get_data(self, mcd_fixture, entity_type, reader, args, keys, values_key):
+        """Test reading data from the first non-empty entity of each type."""
+        entity = _first_with_data(mcd_fixture, entity_type)
+        data = getattr(mcd_fixture.file, reader)(entity["id"], *args)
+
+        if entity_type == MCDFile.ENTITY_ANALOG:
+            count = min(entity["item_count"], ANALOG_PREFIX)
+            assert data["data"].shape == (count,)
+
+        for key in keys:
+            assert key in data
+        if values_key is None:
+            assert isinstance(data["data"], np.ndarray)
+        elif data[values_key].dtype == object:
+            # Text events
+            assert len(data[values_key]) == len(data["timestamps"])
+        else:
+            _assert_analoglike(data, values_key)
+
+    @pytest.mark.slow
+    def test_get_analog_data_full(self, mcd_fixture):
+        """Test reading a whole analog entity."""
+        entity = _first_with_data(mcd_fixture, MCDFile.ENTITY_ANALOG)
+        data = mcd_fixture.file.get_analog_data(entity["id"])
+        assert data["data"].shape == (entity["item_count"],)
+        _assert_analoglike(data)
+
+    @pytest.mark.parametrize("raw", [False, True], ids=["values", "raw"])
+    def test_get_analog_data_blocks(self, mcd_fixture, raw):
+        """Test that a block-by-block read matches a single read."""
+        entity = _first_with_data(mcd_fixture, MCDFile.ENTITY_ANALOG, min_items=2)
+        entity_id = entity["id"]
+        count = min(entity["item_count"], ANALOG_PREFIX)
+        single = mcd_fixture.file.get_analog_data(entity_id, count=count, raw=raw)
+        # Uneven blocks, so the last one is shorter
+        blocked = mcd_fixture.file.get_analog_data(
+            entity_id, count=count, raw=raw, block_size=max(count // 3, 1)
+        )
+
+        np.testing.assert_array_equal(blocked["data"], single["data"])
+        np.testing.assert_array_equal(blocked["timestamps"], single["timestamps"])
+        assert blocked["data"].dtype == single["data"].dtype
+        assert blocked["continuous_count"] == single["continuous_count"]
+
+    def test_get_analog_data_raw(self, mcd_fixture):
+        """Test that int16 codes reconstruct the values within half a step."""
+        entity = _first_with_data(mcd_fixture, MCDFile.ENTITY_ANALOG)
+        mcd = mcd_fixture.file
+        entity_id = entity["id"]
+        count = min(entity["item_count"], ANALOG_PREFIX)
+        values = mcd.get_analog_data(entity_id, count=count)
+        raw = mcd.get_analog_data(entity_id, count=count, raw=True)
+
+        scale, offset = mcd.get_analog_scale(entity_id)
+        assert (raw["scale"], raw["offset"]) == (scale, offset)
+        assert raw["data"].dtype == np.int16
+
+        reconstructed = raw["data"] * scale + offset
+        error = np.abs(reconstructed - values["data"])
+        assert np.all(error <= scale * (0.5 + 1e-6))
+
+    def test_get_analog_data_partial(self, mcd_fixture):
         """Test reading partial analog data."""
-        with MCDFile(TEST_MCD_FILE) as mcd:
-            analog_entities = mcd.get_entities_by_type("analog")
-
-            if len(analog_entities) > 0:
-                entity_id = analog_entities[0]["id"]
-
-                # Read first 100 samples
-                data = mcd.get_analog_data(entity_id, start_index=0, count=100)
-                assert len(data["data"]) <= 100
-
-    def test_get_event_data(self):
-        """Test reading event data."""
-        with MCDFile(TEST_MCD_FILE) as mcd:
-            event_entities = mcd.get_entities_by_type("event")
-
-            if len(event_entities) > 0:
-                entity_id = event_entities[0]["id"]
-                data = mcd.get_event_data(entity_id)
-
-                assert "timestamps" in data
-                assert "values" in data
-                assert isinstance(data["timestamps"], np.ndarray)
-
-    def test_get_segment_data(self):
-        """Test reading segment data."""
-        with MCDFile(TEST_MCD_FILE) as mcd:
-            segment_entities = mcd.get_entities_by_type("segment")
-
-            if len(segment_entities) > 0:
-                entity = segment_entities[0]
-                if entity["item_count"] > 0:
-                    data = mcd.get_segment_data(entity["id"], 0)
-
-                    assert "data" in data
-                    assert "timestamp" in data
-                    assert "sample_count" in data
-                    assert "unit_id" in data
-                    assert isinstance(data["data"], np.ndarray)
-
-    def test_get_all_segments(self):
-        """Test reading all segments."""
-        with MCDFile(TEST_MCD_FILE) as mcd:
-            segment_entities = mcd.get_entities_by_type("segment")
-
-            if len(segment_entities) > 0:
-                entity = segment_entities[0]
-                if entity["item_count"] > 0:
-                    segments = mcd.get_all_segments(entity["id"])
-                    assert len(segments) == entity["item_count"]
-
-    def test_get_neural_data(self):
-        """Test reading neural data."""
-        with MCDFile(TEST_MCD_FILE) as mcd:
-            neural_entities = mcd.get_entities_by_type("neural")
-
-            if len(neural_entities) > 0:
-                entity_id = neural_entities[0]["id"]
-                data = mcd.get_neural_data(entity_id)
-
-                assert "timestamps" in data
-                assert isinstance(data["timestamps"], np.ndarray)
-
-    def test_invalid_entity_type(self):
+        mcd = mcd_fixture.file
+        analog_entities = mcd_fixture.by_type[MCDFile.ENTITY_ANALOG]
+
+        if len(analog_entities) > 0:
+            entity_id = analog_entities[0]["id"]
+
+            # Read first 100 samples
+            data = mcd.get_analog_data(entity_id, start_index=0, count=100)
+            assert len(data["data"]) <= 100
+            _assert_analoglike(data)
+
+            # Read into a caller-provided buffer of exactly the read size
+            count = min(analog_entities[0]["item_count"], 100)
+            buf = np.empty(count, dtype=np.float32)
+            data = mcd.get_analog_data(entity_id, start_index=0, count=count, out=buf)
+            assert data["data"] is buf
+            expected = mcd.get_analog_data(entity_id, start_index=0, count=count)
+            np.testing.assert_array_equal(buf, expected["data"].astype(np.float32))
+
+            # Integer buffers would silently truncate physical values
+            with pytest.raises(ValueError):
+                mcd.get_analog_data(
+                    entity_id, count=count, out=np.empty(count, dtype=np.int8)
+                )
+
+    def test_get_all_segments(self, mcd_fixture):
+        """Test reading a bounded range of segments as arrays."""
+        mcd = mcd_fixture.file
+        segment_entities = mcd_fixture.by_type[MCDFile.ENTITY_SEGMENT]
+
+        if len(segment_entities) > 0:
+            entity = segment_entities[0]
+            if entity["item_count"] > 0:
+                # A prefix covers the array contract without reading every spike
+                count = min(entity["item_count"], 64)
+                segments = mcd.get_all_segments(entity["id"], count=count)
+                assert len(segments["timestamps"]) == count
+                assert segments["waveforms"].shape[0] == count
+                assert segments["unit_ids"].shape == segments["timestamps"].shape
+
+    def test_invalid_entity_type(self, mcd_fixture):
         """Test error handling for wrong entity type."""
-        with MCDFile(TEST_MCD_FILE) as mcd:
-            # Try to read event data from an analog entity
-            analog_entities = mcd.get_entities_by_type("analog")
+        # Try to read event data from an analog entity
+        analog_entities = mcd_fixture.by_type[MCDFile.ENTITY_ANALOG]
 
-            if len(analog_entities) > 0:
-                entity_id = analog_entities[0]["id"]
-                with pytest.raises(ValueError):
-                    mcd.get_event_data(entity_id)
+        if len(analog_entities) > 0:
+            entity_id = analog_entities[0]["id"]
+            with pytest.raises(ValueError):
+                mcd_fixture.file.get_event_data(entity_id)
 
 
 @pytest.mark.skipif(TEST_MCD_FILE is None, reason="No test MCD file specified")
+@pytest.mark.skipif(not H5PY_AVAILABLE, reason="h5py not available")
 class TestMCD2HDF5Converter:
     """Tests for MCD to HDF5 conversion."""
 
-    def test_conversion(self):
+    def test_conversion(self, tmp_path, mcd_fixture):
         """Test MCD to HDF5 conversion."""
-        try:
-            import h5py
-        except ImportError:
-            pytest.skip("h5py not available")
-
-        with tempfile.NamedTemporaryFile(suffix=".h5", delete=False) as tmp:
-            tmp_file = tmp.name
-
-        try:
-            converter = MCD2HDF5Converter(TEST_MCD_FILE, tmp_file)
-            converter.convert()
-
-            # Verify HDF5 file was created
-            assert os.path.exists(tmp_file)
-
-            # Check HDF5 structure
-            with h5py.File(tmp_file, "r") as h5:
-                assert "events" in h5
-                assert "analog" in h5
-                assert "segments" in h5
-                assert "neural" in h5
-
-        finally:
-            # Clean up
-            if os.path.exists(tmp_file):
-                os.remove(tmp_file)
+        tmp_file = tmp_path / "out.h5"
+
+        calls = []
+        converter = MCD2HDF5Converter(TEST_MCD_FILE, tmp_file)
+        converter.convert(lambda *args: calls.append(args))
+
+        # At most one call per percent, plus the final one
+        total = mcd_fixture.file.info()["entity_count"]
+        assert len(calls) <= 101
+        assert calls[-1] == (total, total, "Conversion complete")
+
+        # Verify HDF5 file was created
+        assert tmp_file.exists()
+
+        # Check the top-level groups with a single listing of the root group
+        with h5py.File(tmp_file, "r") as h5:
+            assert {"events", "analog", "segments", "neural"} <= set(h5.keys())
+
+            for entity in mcd_fixture.entities:
+                self._check_entity(h5, mcd_fixture.file, entity)
+
+    @staticmethod
+    def _check_entity(h5, mcd, entity):
+        """Check the datasets written for one entity against the MCD file."""
+        n = entity["item_count"]
+        label = entity["label"].replace("/", "_")
+
+        if entity["type"] == MCDFile.ENTITY_ANALOG:
+            grp = h5["analog"][label]
+            assert grp["data"].shape == (n,)
+            assert grp["data"].dtype == np.int16
+            assert grp["timestamps"].shape == (n,)
+            assert grp["timestamps"].dtype == np.float64
+            scale, offset = mcd.get_analog_scale(entity["id"])
+            assert grp["data"].attrs["scale"] == scale
+            assert grp["data"].attrs["offset"] == offset
+
+        elif entity["type"] == MCDFile.ENTITY_SEGMENT:
+            grp = h5["segments"][label]
+            info = mcd.get_entity_info(entity["id"])
+            assert grp["waveforms"].shape == (
+                n,
+                info["source_count"],
+                info["max_sample_count"],
+            )
+            assert grp["waveforms"].dtype == np.float64
+            assert grp["timestamps"].dtype == np.float64
+            assert grp["sample_counts"].dtype == np.int32
+            assert grp["unit_ids"].dtype == np.int32
+
+            count = min(n, 64)
+            segments = mcd.get_all_segments(entity["id"], count=count)
+            for name in ("waveforms", "timestamps", "sample_counts", "unit_ids"):
+                assert grp[name].shape[0] == n
+                np.testing.assert_array_equal(grp[name][:count], segments[name])
+
+        elif entity["type"] == MCDFile.ENTITY_EVENT:
+            grp = h5["events"][label]
+            assert grp["timestamps"].shape == (n,)
+            assert grp["timestamps"].dtype == np.float64
+
+        elif entity["type"] == MCDFile.ENTITY_NEURAL:
+            grp = h5["neural"][label]
+            assert grp["timestamps"].shape == (n,)
+            assert grp["timestamps"].dtype == np.float64
 
 
 class TestUtilityFunctions:
     """Tests for utility functions that don't require a real file."""
 
-    def test_entity_type_names(self):
+    @pytest.mark.parametrize(
+        "code, name",
+        [
+            pytest.param(MCDFile.ENTITY_EVENT, "event", id="event"),
+            pytest.param(MCDFile.ENTITY_ANALOG, "analog", id="analog"),
+            pytest.param(MCDFile.ENTITY_SEGMENT, "segment", id="segment"),
+            pytest.param(MCDFile.ENTITY_NEURAL, "neural", id="neural"),
+        ],
+    )
+    def test_entity_type_name(self, code, name):
         """Test entity type name mapping."""
-        assert MCDFile.ENTITY_TYPE_NAMES[MCDFile.ENTITY_EVENT] == "event"
-        assert MCDFile.ENTITY_TYPE_NAMES[MCDFile.ENTITY_ANALOG] == "analog"
-        assert MCDFile.ENTITY_TYPE_NAMES[MCDFile.ENTITY_SEGMENT] == "segment"
-        assert MCDFile.ENTITY_TYPE_NAMES[MCDFile.ENTITY_NEURAL] == "neural"
+        assert MCDFile.ENTITY_TYPE_NAMES[code] == name
+
+    def test_entity_type_ids(self):
+        """Test that the reverse mapping inverts ENTITY_TYPE_NAMES."""
+        for code, name in MCDFile.ENTITY_TYPE_NAMES.items():
+            assert MCDFile.ENTITY_TYPE_IDS[name] == code
+
+    @pytest.mark.parametrize("steps", [1000, 65535, 65536, 100000])
+    def test_analog_scale_error(self, steps):
+        """Test that int16 quantization stays within half a step of the value."""
+        resolution = 0.125
+        entity = SimpleNamespace(
+            min_value=-4096.0,
+            max_value=-4096.0 + steps * resolution,
+            resolution=resolution,
+        )
+        scale, offset = MCDFile._analog_scale(entity)
+
+        values = np.linspace(entity.min_value, entity.max_value, 10001)
+        codes = MCDFile._to_int16(values, scale, offset)
+        error = np.abs(codes * scale + offset - values)
+        assert np.all(error <= scale * (0.5 + 1e-6))
+        # Ranges wider than 65535 steps are spread over all int16 codes
+        if steps > 65535:
+            assert (codes[0], codes[-1]) == (-32768, 32767)
+
+    def test_to_object_array(self):
+        """Test copying filled values into an object array."""
+        objects = MCDFile._to_object_array(np.arange(3), 2)
+        assert objects.dtype == object
+        assert list(objects) == [0, 1, None]
+
+    def test_npz_round_trip(self, tmp_path):
+        """Test that NPZWriter archives load with np.load and load_npz_mmap."""
+        arrays = {
+            "vector": np.arange(10, dtype=np.float64),
+            "scalar": np.array(3.5),
+            "empty": np.empty((0, 3), dtype=np.int16),
+            "fortran": np.asfortranarray(np.arange(12, dtype=np.int32).reshape(3, 4)),
+        }
+        filename = tmp_path / "arrays.npz"
+        with NPZWriter(filename) as npz:
+            for name, array in arrays.items():
+                npz.write(name, array)
+
+        with np.load(filename) as loaded:
+            assert sorted(loaded.files) == sorted(arrays)
+            for name, array in arrays.items():
+                np.testing.assert_array_equal(loaded[name], array)
+
+        mapped = load_npz_mmap(filename)
+        assert sorted(mapped) == sorted(arrays)
+        for name, array in arrays.items():
+            assert mapped[name].shape == array.shape
+            assert mapped[name].dtype == array.dtype
+            np.testing.assert_array_equal(mapped[name], array)
+        assert mapped["fortran"].flags.f_contiguous
+
+    def test_npz_mmap_rejects_compressed(self, tmp_path):
+        """Test that compressed members cannot be memory-mapped."""
+        filename = tmp_path / "compressed.npz"
+        np.savez_compressed(filename, data=np.arange(10))
+
+        with pytest.raises(ValueError):
+            load_npz_mmap(filename)
+
+    def test_npz_rejects_object_arrays(self, tmp_path):
+        """Test that arrays requiring pickling are not written."""
+        with NPZWriter(tmp_path / "objects.npz") as npz:
+            with pytest.raises(ValueError):
+                npz.write("labels", np.array(["a", 1], dtype=object))
 
 
 if __name__ == "__main__":